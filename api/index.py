@@ -1,10 +1,11 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Dict
-import pandas as pd
+from typing import List, Dict, Tuple, Union
+from collections import defaultdict
+from functools import lru_cache
 import numpy as np
-import json
+import orjson
 
 app = FastAPI()
 
@@ -33,8 +34,8 @@ class RegionMetrics(BaseModel):
 class MetricsResponse(BaseModel):
     regions: Dict[str, RegionMetrics]
 
-def load_telemetry_data():
-    """Load telemetry data from q-vercel-latency.json"""
+def load_telemetry_data() -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Load q-vercel-latency.json into per-region float64 latency/uptime arrays"""
     try:
         possible_paths = [
             'q-vercel-latency.json',
@@ -45,78 +46,125 @@ def load_telemetry_data():
         data = None
         for path in possible_paths:
             try:
-                with open(path, 'r') as f:
-                    data = json.load(f)
+                with open(path, 'rb') as f:
+                    data = orjson.loads(f.read())
                     break
             except FileNotFoundError:
                 continue
         if data is None:
             raise FileNotFoundError("Could not find q-vercel-latency.json")
-        df_data = []
+        grouped = defaultdict(lambda: ([], []))
         for item in data:
-            df_data.append({
-                'region': item.get('region', ''),
-                'latency_ms': item.get('latency_ms', 0),
-                'uptime': item.get('uptime_pct', 0.0)
-            })
-        return pd.DataFrame(df_data)
+            latencies, uptimes = grouped[str(item.get('region') or '').lower()]  # normalized once for lookups
+            latencies.append(item.get('latency_ms', 0))
+            uptimes.append(item.get('uptime_pct', 0.0))
+        return {
+            region: (np.asarray(latencies, dtype=np.float64), np.asarray(uptimes, dtype=np.float64))
+            for region, (latencies, uptimes) in grouped.items()
+        }
     except Exception as e:
         raise Exception(f"Error loading telemetry data: {e}")
 
+def build_region_stats(region_arrays):
+    """Precompute the threshold-independent metrics for each region"""
+    stats = {}
+    for region, (latencies, uptimes) in region_arrays.items():
+        stats[region] = {
+            "avg_latency": round(float(np.mean(latencies)), 2),
+            "p95_latency": round(float(np.percentile(latencies, 95)), 2),
+            "avg_uptime": round(float(np.mean(uptimes)), 4)  # already in percentage
+        }
+    return stats
+
+def build_sorted_latencies(region_arrays):
+    """Pack every region's sorted latencies into one buffer with [start, end) offsets"""
+    sorted_lat = np.empty(sum(len(lat) for lat, _ in region_arrays.values()), dtype=np.float64)
+    offsets = {}
+    start = 0
+    for region, (latencies, _) in region_arrays.items():
+        end = start + len(latencies)
+        sorted_lat[start:end] = latencies
+        sorted_lat[start:end].sort()
+        # NaNs sort last; keep them out of the range so they never count as breaches
+        offsets[region] = (start, end - int(np.count_nonzero(np.isnan(latencies))))
+        start = end
+    return sorted_lat, offsets
+
 # Load data at startup
 try:
-    df = load_telemetry_data()
+    REGION_ARRAYS = load_telemetry_data()
     data_loaded = True
 except Exception as e:
     print(f"❌ CRITICAL: Failed to load telemetry data: {e}")
-    df = pd.DataFrame(columns=['region', 'latency_ms', 'uptime'])
+    REGION_ARRAYS = {}
     data_loaded = False
 
-@app.post("/", response_model=MetricsResponse)
+REGION_STATS = build_region_stats(REGION_ARRAYS)
+SORTED_LAT, OFFSETS = build_sorted_latencies(REGION_ARRAYS)
+AVAILABLE_REGIONS = list(REGION_ARRAYS)
+# Unknown regions report zeros without entering the metrics cache
+ZERO_METRICS = {"avg_latency": 0.0, "p95_latency": 0.0, "avg_uptime": 0.0, "breaches": 0}
+
+@lru_cache(maxsize=4096)
+def _region_metrics(region: str, threshold: int) -> Dict[str, Union[float, int]]:
+    """Metrics for a known region; the dataset is static so results are memoized"""
+    stats = REGION_STATS[region]
+    start, end = OFFSETS[region]
+    # Everything right of the insertion point is strictly above the threshold
+    breaches = int(end - start - np.searchsorted(SORTED_LAT[start:end], threshold, side='right'))
+    return {
+        "avg_latency": stats["avg_latency"],
+        "p95_latency": stats["p95_latency"],
+        "avg_uptime": stats["avg_uptime"],
+        "breaches": breaches
+    }
+
+# Requests naming at most this many regions, all known, have their body memoized
+MAX_CACHED_REGIONS = 16
+
+def _encode_payload(regions: Tuple[str, ...], threshold: int) -> bytes:
+    """Encoded response body for a whole request"""
+    results = {}
+    for region in regions:
+        key = region.lower()
+        results[region] = _region_metrics(key, threshold) if key in REGION_STATS else ZERO_METRICS
+    return orjson.dumps({"regions": results})
+
+# Only fed small known-region requests, so retained bodies stay bounded in size
+_cached_payload = lru_cache(maxsize=256)(_encode_payload)
+
+# MetricsResponse documents the schema only; the body is encoded directly with orjson
+@app.post("/", response_class=Response, responses={200: {"model": MetricsResponse}})
 async def calculate_metrics(request: MetricsRequest):
     if not data_loaded:
         raise HTTPException(status_code=500, detail="Telemetry data not loaded")
-    results = {}
-    for region in request.regions:
-        region_data = df[df['region'] == region]
-        if len(region_data) == 0:
-            results[region] = {
-                "avg_latency": 0.0,
-                "p95_latency": 0.0,
-                "avg_uptime": 0.0,
-                "breaches": 0
-            }
-            continue
-        latencies = region_data['latency_ms'].values
-        uptimes = region_data['uptime'].values
-        avg_latency = float(np.mean(latencies))
-        p95_latency = float(np.percentile(latencies, 95))
-        avg_uptime = float(np.mean(uptimes))  # already in percentage
-        breaches = int(np.sum(latencies > request.threshold_ms))
-        results[region] = {
-            "avg_latency": round(avg_latency, 2),
-            "p95_latency": round(p95_latency, 2),
-            "avg_uptime": round(avg_uptime, 4),
-            "breaches": breaches
-        }
-    return {"regions": results}
+    # Repeats collapse in the JSON object anyway; first-seen order keeps the caller's key order
+    regions = tuple(dict.fromkeys(request.regions))
+    if len(regions) <= MAX_CACHED_REGIONS and all(r.lower() in REGION_STATS for r in regions):
+        content = _cached_payload(regions, request.threshold_ms)
+    else:
+        content = _encode_payload(regions, request.threshold_ms)
+    return Response(content=content, media_type="application/json")
+
+# The GET bodies never change after startup, so encode them once
+ROOT_BODY = orjson.dumps({
+    "message": "eShopCo Telemetry API",
+    "status": "active" if data_loaded else "data_loading_failed",
+    "data_loaded": data_loaded,
+    "available_regions": AVAILABLE_REGIONS,
+    "usage": "POST / with {'regions': ['amer','emea'], 'threshold_ms': 180}"
+})
+HEALTH_BODY = orjson.dumps({
+    "status": "healthy" if data_loaded else "degraded",
+    "data_loaded": data_loaded,
+    "total_records": len(SORTED_LAT),
+    "regions_available": AVAILABLE_REGIONS
+})
 
 @app.get("/")
 async def root():
-    status = "active" if data_loaded else "data_loading_failed"
-    return {
-        "message": "eShopCo Telemetry API",
-        "status": status,
-        "data_loaded": data_loaded,
-        "available_regions": df['region'].unique().tolist() if data_loaded else [],
-        "usage": "POST / with {'regions': ['amer','emea'], 'threshold_ms': 180}"
-    }
+    return Response(content=ROOT_BODY, media_type="application/json")
 
 @app.get("/health")
 async def health():
-    return {
-        "status": "healthy" if data_loaded else "degraded",
-        "data_loaded": data_loaded,
-        "total_records": len(df) if data_loaded else 0,
-        "regions_available": df['region'].unique().tolist() if data_loaded else []
-    }
+    return Response(content=HEALTH_BODY, media_type="application/json")